@@ -1,7 +1,13 @@
+import argparse
 import asyncio
+import copy
+import functools
+import sys
+import threading
+from collections import deque
 from typing import Optional, Literal
 
-from pydantic import BaseModel, Field
+import msgspec
 
 # Core Agents SDK imports
 from agents import (
@@ -10,8 +16,9 @@ from agents import (
     function_tool,
     OutputGuardrail,
     GuardrailFunctionOutput,
+    ItemHelpers,
+    OutputGuardrailTripwireTriggered,
 )
-from agents.stream_events import RunItemStreamEvent, RawResponsesStreamEvent
 from agents.run_context import RunContextWrapper  # to access shared context inside tools
 import os
 from dotenv import load_dotenv
@@ -19,34 +26,64 @@ from dotenv import load_dotenv
 # ---------------------------
 # Load API Key
 # ---------------------------
-load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    raise ValueError("⚠ GEMINI_API_KEY is missing in .env")
+# Deferred until the CLI starts so importing this module stays cheap.
+@functools.cache
+def get_api_key() -> str:
+    load_dotenv()
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise ValueError("⚠ GEMINI_API_KEY is missing in .env")
+    return api_key
 
 
 
 
 
 # ---------------------------
-# Shared Pydantic context
+# Issue types
 # ---------------------------
-class SupportContext(BaseModel):
-    name: Optional[str] = Field(default=None, description="User name, if known")
-    is_premium_user: bool = Field(default=False, description="Premium status")
-    issue_type: Optional[Literal["billing", "technical", "general"]] = Field(
-        default=None, description="Latest classified issue type for current message"
-    )
-    account_id: Optional[str] = Field(
-        default=None, description="User account identifier (if provided)"
-    )
+# Shared by the context field and set_issue_type; with strict_mode the SDK's
+# argument model rejects any other value before the tool body runs.
+IssueType = Literal["billing", "technical", "general"]
+
+
+# ---------------------------
+# Shared msgspec context
+# ---------------------------
+# Structs are slot-backed (no per-instance __dict__). Every field is a scalar,
+# so the instance can't join a reference cycle and GC tracking is turned off.
+class SupportContext(msgspec.Struct, gc=False):
+    """Shared run context.
+
+    Fields starting with an underscore are internal bookkeeping. msgspec has no
+    per-field exclusion, so they still appear in repr() and raw encodes; use
+    context_snapshot() rather than msgspec.to_builtins/json.encode directly.
+    """
+
+    name: Optional[str] = None  # User name, if known
+    is_premium_user: bool = False  # Premium status
+    # Latest classified issue type for current message
+    issue_type: Optional[IssueType] = None
+    account_id: Optional[str] = None  # User account identifier (if provided)
+    # Internal: bumped by tools when they change a field, so the CLI can skip
+    # re-dumping an unchanged context. Not part of the user-facing snapshot.
+    _ctx_version: int = 0
+
+
+def context_snapshot(context: SupportContext) -> dict:
+    """Returns the user-facing fields of the context as plain builtins."""
+    data = msgspec.to_builtins(context)
+    return {key: value for key, value in data.items() if not key.startswith("_")}
 
 
 # ---------------------------
 # Utility: small helper to coerce bool-ish strings from CLI
 # ---------------------------
+_TRUTHY = frozenset({"1", "y", "yes", "true", "t"})
+
+
 def to_bool(s: str) -> bool:
-    return s.strip().lower() in {"1", "y", "yes", "true", "t"}
+    return s.strip().lower() in _TRUTHY
 
 
 # ---------------------------
@@ -62,9 +99,11 @@ def to_bool(s: str) -> bool:
     ),
     strict_mode=True,
 )
-def set_issue_type(ctx: RunContextWrapper[SupportContext], issue_type: Literal["billing", "technical", "general"]) -> str:
+def set_issue_type(ctx: RunContextWrapper[SupportContext], issue_type: IssueType) -> str:
     """Sets the context.issue_type to guide handoff and tool gating."""
-    ctx.context.issue_type = issue_type
+    if ctx.context.issue_type != issue_type:
+        ctx.context.issue_type = issue_type
+        ctx.context._ctx_version += 1
     return f"issue_type set to '{issue_type}'"
 
 
@@ -80,14 +119,15 @@ def update_user_profile(
 ) -> str:
     """Updates shared context with name and/or account_id if present."""
     changed = []
-    if name:
+    if name and name != ctx.context.name:
         ctx.context.name = name
         changed.append(f"name='{name}'")
-    if account_id:
+    if account_id and account_id != ctx.context.account_id:
         ctx.context.account_id = account_id
         changed.append(f"account_id='{account_id}'")
     if not changed:
         return "No changes made."
+    ctx.context._ctx_version += 1
     return "Updated: " + ", ".join(changed)
 
 
@@ -98,7 +138,7 @@ def update_user_profile(
         "Only permitted for premium users; otherwise the tool is disabled."
     ),
     # Dynamically enable this tool only for premium users
-    is_enabled=lambda ctx, agent: bool(getattr(ctx.context, "is_premium_user", False)),
+    is_enabled=lambda ctx, agent: ctx.context.is_premium_user,
     strict_mode=True,
 )
 def refund(order_id: str, amount: float) -> str:
@@ -122,7 +162,7 @@ def invoice_status(account_id: Optional[str] = None) -> str:
         "Restart a backend service by name. "
         'Enabled only if context.issue_type == "technical".'
     ),
-    is_enabled=lambda ctx, agent: getattr(ctx.context, "issue_type", None) == "technical",
+    is_enabled=lambda ctx, agent: ctx.context.issue_type == "technical",
     strict_mode=True,
 )
 def restart_service(service_name: str) -> str:
@@ -149,14 +189,20 @@ def faq(query: str) -> str:
 # Block apology words in final output (e.g., 'sorry', 'apologize')
 # ---------------------------
 
-async def no_apologies_guardrail(ctx: RunContextWrapper[SupportContext], agent: Agent, final_text: str) -> GuardrailFunctionOutput:
+# Checked against one lowercased copy of the output with str's C substring search,
+# which beats a re.IGNORECASE pattern (that flag disables the literal fast-search).
+_BANNED_WORDS = ("sorry", "apologize", "apologies", "apologise")
+
+def no_apologies_guardrail(ctx: RunContextWrapper[SupportContext], agent: Agent, final_text: str) -> GuardrailFunctionOutput:
     txt = (final_text or "").lower()
-    banned = ("sorry", "apologize", "apologies", "apologise")
-    triggered = any(word in txt for word in banned)
+    triggered = any(word in txt for word in _BANNED_WORDS)
     return GuardrailFunctionOutput(output_info=None, tripwire_triggered=triggered)
 
 no_apologies_output_guardrail = OutputGuardrail(guardrail_function=no_apologies_guardrail)
 
+# One list shared by every agent (the SDK requires a list, not a tuple); never mutate it
+OUTPUT_GUARDRAILS = [no_apologies_output_guardrail]
+
 
 # ---------------------------
 # AGENTS
@@ -173,7 +219,7 @@ billing_agent = Agent(
         "without using apology words."
     ),
     tools=[refund, invoice_status],
-    output_guardrails=[no_apologies_output_guardrail],
+    output_guardrails=OUTPUT_GUARDRAILS,
 )
 
 # Technical specialist
@@ -186,7 +232,7 @@ technical_agent = Agent(
         "Avoid apology words."
     ),
     tools=[restart_service, check_service_status],
-    output_guardrails=[no_apologies_output_guardrail],
+    output_guardrails=OUTPUT_GUARDRAILS,
 )
 
 # General support specialist
@@ -198,7 +244,7 @@ general_agent = Agent(
         "Avoid apology words."
     ),
     tools=[faq],
-    output_guardrails=[no_apologies_output_guardrail],
+    output_guardrails=OUTPUT_GUARDRAILS,
 )
 
 # TRIAGE agent — decides handoff and sets context.issue_type via tool
@@ -213,7 +259,7 @@ triage_agent = Agent(
     ),
     tools=[set_issue_type, update_user_profile],
     handoffs=[billing_agent, technical_agent, general_agent],
-    output_guardrails=[no_apologies_output_guardrail],
+    output_guardrails=OUTPUT_GUARDRAILS,
 )
 
 
@@ -221,30 +267,68 @@ triage_agent = Agent(
 # Streaming Printer
 # ---------------------------
 
+# Lines are buffered and written in batches (every STREAM_FLUSH_INTERVAL
+# seconds, or immediately for message output) instead of one write per event.
+STREAM_FLUSH_INTERVAL = 0.05
+_out_buf: deque[str] = deque()
+
+
+def _emit(text: str) -> None:
+    _out_buf.append(text + "\n")
+
+
+def flush_output() -> None:
+    """Write any buffered stream lines to stdout."""
+    if _out_buf:
+        sys.stdout.write("".join(_out_buf))
+        _out_buf.clear()
+        sys.stdout.flush()
+
+
+async def _flusher(interval: float = STREAM_FLUSH_INTERVAL) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        flush_output()
+
+
+def _on_handoff_occurred(evt):
+    _emit(f"\n[handoff → {evt.item.target_agent.name}]")
+
+
+def _on_tool_called(evt):
+    _emit(f"[tool call] {evt.item.raw_item.name}")
+
+
+def _on_tool_output(evt):
+    _emit(f"[tool output] {evt.item.output}")
+
+
+def _on_message_output(evt):
+    content = ItemHelpers.text_message_output(evt.item)
+    if content:
+        _emit(f"\n{content}\n")
+        # Final answer for this step: show it right away
+        flush_output()
+
+
+# RunItemStreamEvent.name -> handler. Each name always carries the same item type
+# (HandoffOutputItem, ToolCallItem, ToolCallOutputItem, MessageOutputItem), so the
+# handlers read its fields directly. "handoff_requested" is skipped: its item has no
+# target agent, which "handoff_occured" reports. Raw token events
+# (RawResponsesStreamEvent) have no `name` and are skipped too.
+_STREAM_HANDLERS = {
+    "handoff_occured": _on_handoff_occurred,
+    "tool_called": _on_tool_called,
+    "tool_output": _on_tool_output,
+    "message_output_created": _on_message_output,
+}
+
+
 def print_stream_event(evt):
     """Pretty-print streaming events during a run."""
-    if isinstance(evt, RunItemStreamEvent):
-        if evt.name == "handoff_requested":
-            to_agent = getattr(evt.item, "handoff_to", None)
-            if to_agent:
-                print(f"\n[handoff → {to_agent.name}]")
-        elif evt.name == "handoff_occured":
-            agent_now = getattr(evt.item, "message", None)
-            if agent_now:
-                print(f"[active agent] {agent_now.get('agent', {}).get('name', '—')}")
-        elif evt.name == "tool_called":
-            tool_name = getattr(evt.item, "tool_name", "tool")
-            print(f"[tool call] {tool_name}")
-        elif evt.name == "tool_output":
-            output = getattr(evt.item, "output", "")
-            print(f"[tool output] {output}")
-        elif evt.name == "message_output_created":
-            content = getattr(evt.item, "content", "")
-            if content:
-                print(f"\n{content}\n")
-    elif isinstance(evt, RawResponsesStreamEvent):
-        # Raw token stream from LLMs (optional to print; can be noisy)
-        pass
+    handler = _STREAM_HANDLERS.get(getattr(evt, "name", None))
+    if handler:
+        handler(evt)
 
 
 # ---------------------------
@@ -256,7 +340,7 @@ WELCOME = """\
  Console Support Agent System  —  OpenAI Agents SDK
  - Triage + Billing + Technical + General
  - Tools w/ dynamic is_enabled
- - Context sharing (Pydantic)
+ - Context sharing (msgspec)
  - Agent-to-agent handoffs
  - Streaming event display
  - Output guardrail (blocks 'sorry'/'apologize')
@@ -264,24 +348,52 @@ WELCOME = """\
 Type 'exit' to quit.
 """
 
+async def ainput(prompt: str = "") -> str:
+    """input() run in a worker thread so the event loop is not blocked.
+
+    The thread is a daemon rather than an executor worker: on Ctrl-C the loop
+    shuts down without waiting for the pending input() to return.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def _deliver(setter, value):
+        if not future.done():
+            setter(value)
+
+    def _read():
+        try:
+            line = input(prompt)
+        except BaseException as exc:  # EOFError, KeyboardInterrupt, ...
+            loop.call_soon_threadsafe(_deliver, future.set_exception, exc)
+        else:
+            loop.call_soon_threadsafe(_deliver, future.set_result, line)
+
+    threading.Thread(target=_read, daemon=True).start()
+    return await future
+
+
 async def run_console():
+    get_api_key()
     print(WELCOME)
 
     # Gather initial context from CLI
-    name = input("Enter your name (or leave blank): ").strip() or None
-    is_premium = to_bool(input("Are you a premium user? [y/N]: ") or "n")
-    account_id = input("Account ID (optional): ").strip() or None
+    name = (await ainput("Enter your name (or leave blank): ")).strip() or None
+    is_premium = to_bool(await ainput("Are you a premium user? [y/N]: ") or "n")
+    account_id = (await ainput("Account ID (optional): ")).strip() or None
 
     context = SupportContext(name=name, is_premium_user=is_premium, account_id=account_id)
 
-    print("\nContext saved:", context.model_dump())
+    snapshot = context_snapshot(context)
+    last_version = context._ctx_version
+    print("\nContext saved:", snapshot)
     print("\nAsk your question(s). Examples:")
     print(" - I want a refund for order 123, amount 49.99")
     print(" - Restart the payments service")
     print(" - What’s your delivery policy?\n")
 
     while True:
-        user_input = input("You: ").strip()
+        user_input = (await ainput("You: ")).strip()
         if not user_input:
             continue
         if user_input.lower() in {"exit", "quit"}:
@@ -289,13 +401,100 @@ async def run_console():
             break
 
         # Stream the whole orchestration starting at triage
-        async for event in Runner.run_streamed(triage_agent, input=user_input, context=context):
-            print_stream_event(event)
+        flusher = asyncio.create_task(_flusher())
+        try:
+            result = Runner.run_streamed(triage_agent, input=user_input, context=context)
+            async for event in result.stream_events():
+                print_stream_event(event)
+        finally:
+            flusher.cancel()
+            flush_output()
 
         # Note: context is mutable; triage tools may have updated it
-        # (e.g., issue_type). Show the latest snapshot after each turn:
-        print(f"[context] {context.model_dump()}\n")
+        # (e.g., issue_type). Re-dump only if a tool bumped the version,
+        # then show the latest snapshot after each turn:
+        if context._ctx_version != last_version:
+            snapshot = context_snapshot(context)
+            last_version = context._ctx_version
+        print(f"[context] {snapshot}\n")
+
+
+# ---------------------------
+# Batch mode
+# ---------------------------
+
+BATCH_CONCURRENCY = 8
+
+
+async def _run_one(question: str, context: SupportContext, sem: asyncio.Semaphore) -> str:
+    async with sem:
+        try:
+            result = await Runner.run(triage_agent, input=question, context=context)
+        except OutputGuardrailTripwireTriggered:
+            return "[guardrail] response blocked"
+        except Exception as exc:  # report per question; don't abort the rest of the batch
+            return f"[error] {type(exc).__name__}: {exc}"
+        return str(result.final_output)
+
+
+async def run_batch(
+    path: str, base: SupportContext, concurrency: int = BATCH_CONCURRENCY
+):
+    """Answer every non-empty line of `path`, running at most `concurrency` at once.
+
+    Every question starts from its own copy of `base`.
+    """
+    get_api_key()
+    with open(path, encoding="utf-8") as f:
+        questions = [line.strip() for line in f if line.strip()]
+
+    # Each run gets its own copy so tool mutations (issue_type etc.) don't clash.
+    # Runs are not streamed: concurrent event output would interleave.
+    sem = asyncio.Semaphore(concurrency)
+    tasks = [asyncio.create_task(_run_one(q, copy.copy(base), sem)) for q in questions]
+    answers = await asyncio.gather(*tasks)
+
+    for question, answer in zip(questions, answers):
+        print(f"You: {question}\n{answer}\n")
+
+
+def _positive_int(value: str) -> int:
+    try:
+        n = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected an integer, got {value!r}") from None
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {n}")
+    return n
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Console support agent system.")
+    parser.add_argument(
+        "--batch", metavar="FILE", help="answer each line of FILE concurrently instead of prompting"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=_positive_int,
+        default=BATCH_CONCURRENCY,
+        help=f"max concurrent runs in batch mode (default: {BATCH_CONCURRENCY})",
+    )
+    # Batch mode can't prompt for the initial context, so it comes from flags
+    parser.add_argument("--name", help="user name for batch mode")
+    parser.add_argument(
+        "--premium", action="store_true", help="treat the batch user as premium (enables refund)"
+    )
+    parser.add_argument("--account-id", help="account ID for batch mode")
+    args = parser.parse_args()
+
+    if args.batch:
+        base = SupportContext(
+            name=args.name, is_premium_user=args.premium, account_id=args.account_id
+        )
+        asyncio.run(run_batch(args.batch, base, args.concurrency))
+    else:
+        asyncio.run(run_console())
 
 
 if __name__ == "__main__":
-    asyncio.run(run_console())
+    main()